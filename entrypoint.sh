@@ -37,4 +37,4 @@ fi
 # Ensure ownership of app dir (idempotent)
 chown -R "$PUID:$PGID" /app >/dev/null 2>&1 || true
 
-exec gosu "$PUID:$PGID" uvicorn app:APP --host 0.0.0.0 --port "$APP_PORT"
+exec gosu "$PUID:$PGID" uvicorn app:APP --host 0.0.0.0 --port "$APP_PORT" --loop uvloop --http httptools
@@ -1,17 +1,22 @@
 import os
+import sys
+import asyncio
+import gzip
+import hashlib
 import time
-import re
 import logging
-from typing import Any, Dict, List, Tuple, Optional
-from urllib.parse import urlencode
-
-import requests
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
+from contextlib import asynccontextmanager, suppress
+from typing import Any, AsyncIterator, Dict, List, Tuple, Optional
+from urllib.parse import unquote_plus, urlencode
+
+import httpx
+import msgspec
+import numpy as np
+import orjson
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response
 from rich.logging import RichHandler
 
-APP = FastAPI(title="homepage-geoip-heatmap")
-
 # -----------------------------
 # Env (reusing SWAG/geoip2influx where possible)
 # -----------------------------
@@ -31,6 +36,7 @@ HEATMAP_TIME_WINDOW = os.getenv("HEATMAP_TIME_WINDOW", "24h")
 HEATMAP_REFRESH_SECONDS = int(os.getenv("HEATMAP_REFRESH_SECONDS", "30"))
 HEATMAP_CACHE_SECONDS = int(os.getenv("HEATMAP_CACHE_SECONDS", "30"))
 HEATMAP_MAX_POINTS = int(os.getenv("HEATMAP_MAX_POINTS", "20000"))
+HEATMAP_GRID_DECIMALS = min(int(os.getenv("HEATMAP_GRID_DECIMALS", "2")), 6)  # <0 disables
 HEATMAP_TITLE = os.getenv("HEATMAP_TITLE", "").strip()
 
 # Internal: base URL to InfluxDB v1
@@ -41,15 +47,24 @@ INFLUX_BASE = f"http://{INFLUX_HOST}:{INFLUX_HOST_PORT}".rstrip("/")
 # -----------------------------
 LOG_LEVEL = "DEBUG" if DEBUG else os.getenv("LOG_LEVEL", "INFO").strip().upper()
 
-logging.basicConfig(
-    level=LOG_LEVEL,
-    format="%(message)s",
-    datefmt="[%X]",
-    handlers=[RichHandler(rich_tracebacks=True, markup=True)],
-)
+# Rich only for interactive terminals; container logs get a plain (much cheaper) handler
+if sys.stderr.isatty():
+    logging.basicConfig(
+        level=LOG_LEVEL,
+        format="%(message)s",
+        datefmt="[%X]",
+        handlers=[RichHandler(rich_tracebacks=True)],
+    )
+else:
+    logging.basicConfig(
+        level=LOG_LEVEL,
+        format="%(asctime)s %(levelname)-8s %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        handlers=[logging.StreamHandler()],
+    )
 log = logging.getLogger("homepage-geoip-heatmap")
 
-log.info("[bold]Starting homepage-geoip-heatmap[/bold]")
+log.info("Starting homepage-geoip-heatmap")
 log.info(
     "Influx target: base=%s db=%s measurement=%s user=%s window=%s",
     INFLUX_BASE,
@@ -60,20 +75,63 @@ log.info(
 )
 log.info("Debug mode: %s", DEBUG)
 
+# httpx logs every request line at INFO; only show those when debugging
+if not DEBUG:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# -----------------------------
+# Shared async HTTP client (opened/closed by the app lifespan)
+# -----------------------------
+CLIENT: Optional[httpx.AsyncClient] = None
+
+# keep the Influx connection alive across cache refreshes (httpx default expiry is 5s)
+INFLUX_LIMITS = httpx.Limits(
+    max_connections=16,
+    max_keepalive_connections=4,
+    keepalive_expiry=float(max(60, HEATMAP_CACHE_SECONDS * 2)),
+)
+
 # -----------------------------
 # in-memory cache for /data
 # -----------------------------
 _cache_at: float = 0.0
-_cache_points: List[List[float]] = []  # [[lat, lon, weight], ...]
+_cache_count: int = 0
+_cache_bytes: bytes = b"[]"  # orjson-encoded [[lat, lon, weight], ...]
+_cache_bytes_gz: Optional[bytes] = None  # gzip of _cache_bytes, None when too small to bother
+_cache_etag: str = ""
 _cache_last_error: Optional[str] = None
 
+# below this, gzip framing overhead outweighs the savings
+_GZIP_MIN_BYTES = 1024
+
 # choropleth
 _country_cache_at: float = 0.0
 _country_cache: Dict[str, float] = {}  # {"US": 1234, ...}
 _country_cache_last_error: Optional[str] = None
 
+# single-flight guards: concurrent misses wait for one Influx query instead of each sending their own
+_refresh_lock = asyncio.Lock()
+_country_refresh_lock = asyncio.Lock()
+
+# static page, read once at startup
+try:
+    with open("/app/index.html", "rb") as f:
+        _INDEX_HTML: Optional[bytes] = f.read()
+except FileNotFoundError:
+    _INDEX_HTML = None
+    log.warning("index.html not found at /app/index.html")
+
 # duration check to avoid accidental query injection via env
-_DURATION_RE = re.compile(r"^[0-9]+(ms|s|m|h|d|w)$")
+_DURATION_UNITS = frozenset("smhdw")
+
+
+def _valid_duration(window: str) -> bool:
+    """Same as ^[0-9]+(ms|s|m|h|d|w)$ without going through re."""
+    if not window.isascii():
+        return False
+    return (window[:-1].isdigit() and window[-1] in _DURATION_UNITS) or (
+        window[:-2].isdigit() and window[-2:] == "ms"
+    )
 
 
 def _read_influx_password() -> str:
@@ -89,90 +147,192 @@ def _read_influx_password() -> str:
     return ""
 
 
-def _influx_auth() -> Optional[Tuple[str, str]]:
-    if not INFLUX_USER:
-        return None
-    pw = _read_influx_password()
-    return (INFLUX_USER, pw)
+# read once at startup; a rotated password needs a container restart
+_AUTH: Optional[Tuple[str, str]] = (INFLUX_USER, _read_influx_password()) if INFLUX_USER else None
+
+
+# Influx /query response shape (fields we don't use are ignored by the decoder)
+class InfluxSeries(msgspec.Struct):
+    tags: Optional[Dict[str, str]] = None
+    columns: List[str] = []
+    values: List[List[Any]] = []
+
+
+class InfluxResult(msgspec.Struct):
+    series: List[InfluxSeries] = []
+    error: Optional[str] = None  # statement failures come back as HTTP 200 with this set
+
+
+class InfluxResponse(msgspec.Struct):
+    results: List[InfluxResult] = []
+
+
+_JSON_DECODER = msgspec.json.Decoder(InfluxResponse)
+_MSGPACK_DECODER = msgspec.msgpack.Decoder(InfluxResponse)
 
 
-def _influx_query(q: str) -> Dict[str, Any]:
-    params = {"db": INFLUX_DATABASE, "q": q}
-    url = f"{INFLUX_BASE}/query?{urlencode(params)}"
+def _query_url(q: str) -> str:
+    # relative to the client's base_url, which stays the one place the host is configured
+    return "/query?" + urlencode({"db": INFLUX_DATABASE, "q": q})
+
+
+async def _influx_query(url: str) -> InfluxResponse:
+    """GET a pre-encoded /query path (see _query_url)."""
+    if CLIENT is None:
+        raise RuntimeError("Influx client not initialised (app lifespan not started)")
 
     # Important debug visibility
-    if DEBUG:
-        log.debug("Influx GET %s", url)
-        log.debug("InfluxQL: %s", q)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Influx GET %s%s", INFLUX_BASE, url)
+        log.debug("InfluxQL: %s", unquote_plus(url.partition("&q=")[2]))
 
-    r = requests.get(url, auth=_influx_auth(), timeout=10)
+    # Influx >= 1.4 can answer in msgpack (same result shape, cheaper to decode);
+    # older builds ignore the header and send JSON.
+    r = await CLIENT.get(url, headers={"Accept": "application/x-msgpack"})
 
-    # If non-2xx, log body (Influx often returns useful JSON errors)
+    is_msgpack = r.headers.get("content-type", "").startswith("application/x-msgpack")
+
+    # If non-2xx, log body (Influx often returns useful errors; msgpack-encoded when we asked for it)
     if r.status_code >= 400:
-        body = r.text[:2000]
+        if is_msgpack:
+            body = r.headers.get("X-InfluxDB-Error", "")
+            try:
+                body = msgspec.msgpack.decode(r.content).get("error") or body
+            except Exception:
+                pass
+        else:
+            body = r.text[:2000]
         log.error("Influx error: HTTP %s body=%s", r.status_code, body)
         r.raise_for_status()
 
-    return r.json()
+    payload = _MSGPACK_DECODER.decode(r.content) if is_msgpack else _JSON_DECODER.decode(r.content)
+    _first_result(payload)  # raise on statement errors so callers record them
+    return payload
+
+
+def _first_result(payload: InfluxResponse) -> Optional[InfluxResult]:
+    if not payload.results:
+        return None
+    result = payload.results[0]
+    if result.error:
+        raise RuntimeError(f"Influx query error: {result.error}")
+    return result
 
 
 def _build_query() -> str:
     window = HEATMAP_TIME_WINDOW.strip()
-    if not _DURATION_RE.match(window):
+    if not _valid_duration(window):
         log.warning("Invalid HEATMAP_TIME_WINDOW=%r, falling back to 24h", window)
         window = "24h"
 
     meas = GEO_MEASUREMENT.replace('"', "")
-    return (
+    grouped = (
         f'SELECT SUM("count") AS hits '
         f'FROM "{meas}" '
         f'WHERE time > now() - {window} '
         f'GROUP BY "latitude","longitude"'
     )
+    # With grid aggregation on, the cap has to apply to summed cells, so it stays in
+    # _parse_points. Otherwise let Influx keep only the top-K locations so the response
+    # stays bounded; this returns one series with latitude/longitude as columns, not tags.
+    if not HEATMAP_MAX_POINTS or HEATMAP_MAX_POINTS <= 0 or HEATMAP_GRID_DECIMALS >= 0:
+        return grouped
 
+    return f'SELECT TOP("hits", "latitude", "longitude", {HEATMAP_MAX_POINTS}) AS hits FROM ({grouped})'
 
-def _parse_points(payload: Dict[str, Any]) -> List[List[float]]:
-    points: List[List[float]] = []
 
-    results = payload.get("results") or []
-    if not results:
-        return points
+# env is fixed for the process lifetime; build once, reuse on every refresh
+_QUERY_STRING = _build_query()
+_QUERY_URL = _query_url(_QUERY_STRING)
 
-    series_list = results[0].get("series") or []
-    for s in series_list:
-        tags = s.get("tags") or {}
-        lat_s = tags.get("latitude")
-        lon_s = tags.get("longitude")
-        if lat_s is None or lon_s is None:
-            continue
 
-        try:
-            lat = float(lat_s)
-            lon = float(lon_s)
-        except (ValueError, TypeError):
-            continue
+def _parse_points(payload: InfluxResponse) -> List[List[float]]:
+    result = _first_result(payload)
+    if result is None:
+        return []
+
+    series_list = result.series
+    n_rows = sum(len(s.values) for s in series_list)
+    if n_rows == 0:
+        return []
+
+    # structure-of-arrays buffers, sized up front (one slot per row at most)
+    lat_buf = np.empty(n_rows, dtype=np.float64)
+    lon_buf = np.empty(n_rows, dtype=np.float64)
+    hits_buf = np.empty(n_rows, dtype=np.float64)
+    k = 0
+
+    for s in series_list:
+        # GROUP BY query: lat/lon are series tags, one [time, hits] row per series
+        # TOP() query: a single series with [time, hits, latitude, longitude] rows
+        tags = s.tags or {}
+        columns = s.columns
+        lat_i = columns.index("latitude") if "latitude" in columns else -1
+        lon_i = columns.index("longitude") if "longitude" in columns else -1
+        hits_i = columns.index("hits") if "hits" in columns else 1
+        width = max(lat_i, lon_i, hits_i) + 1
+
+        for row in s.values:
+            if len(row) < width:
+                continue
+
+            lat_s = row[lat_i] if lat_i >= 0 else tags.get("latitude")
+            lon_s = row[lon_i] if lon_i >= 0 else tags.get("longitude")
+            if lat_s is None or lon_s is None:
+                continue
 
-        values = s.get("values") or []
-        hits = 0.0
-        if values and len(values[0]) >= 2 and values[0][1] is not None:
             try:
-                hits = float(values[0][1])
+                lat = float(lat_s)
+                lon = float(lon_s)
+                hits = float(row[hits_i]) if row[hits_i] is not None else 0.0
             except (ValueError, TypeError):
-                hits = 0.0
+                continue
 
-        if hits > 0:
-            points.append([lat, lon, hits])
+            if hits > 0:
+                lat_buf[k] = lat
+                lon_buf[k] = lon
+                hits_buf[k] = hits
+                k += 1
+
+    if k == 0:
+        return []
+
+    lat_a, lon_a, hits_a = lat_buf[:k], lon_buf[:k], hits_buf[:k]
+
+    if HEATMAP_GRID_DECIMALS >= 0:
+        lat_a, lon_a, hits_a = _aggregate_grid(lat_a, lon_a, hits_a, HEATMAP_GRID_DECIMALS)
+
+    # without the grid, TOP() in _build_query already applied the cap and this is a no-op
+    cap = HEATMAP_MAX_POINTS
+    if cap and cap > 0 and len(hits_a) > cap:
+        # top-K cells by weight: O(N) selection instead of a full sort
+        idx = np.argpartition(hits_a, -cap)[-cap:]
+        lat_a, lon_a, hits_a = lat_a[idx], lon_a[idx], hits_a[idx]
+
+    return np.column_stack([lat_a, lon_a, hits_a]).tolist()
 
-    if HEATMAP_MAX_POINTS and HEATMAP_MAX_POINTS > 0 and len(points) > HEATMAP_MAX_POINTS:
-        points.sort(key=lambda p: p[2], reverse=True)
-        points = points[:HEATMAP_MAX_POINTS]
 
-    return points
+def _aggregate_grid(
+    lat: np.ndarray, lon: np.ndarray, hits: np.ndarray, decimals: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Snap coordinates to a 10^-decimals degree grid and sum hits per cell.
+    Leaflet.heat can't tell sub-pixel points apart, so this just shrinks the payload.
+    """
+    scale = 10**decimals
+    width = 360 * scale + 1  # number of distinct longitude cells
+    lat_q = np.rint(lat * scale).astype(np.int64)
+    lon_q = np.rint((lon + 180.0) * scale).astype(np.int64)
+
+    cells, inv = np.unique(lat_q * width + lon_q, return_inverse=True)
+    summed = np.bincount(inv.ravel(), weights=hits)
+
+    return (cells // width) / scale, (cells % width - 180 * scale) / scale, summed
 
 # choropleth
 def _build_country_query() -> str:
     window = HEATMAP_TIME_WINDOW.strip()
-    if not _DURATION_RE.match(window):
+    if not _valid_duration(window):
         log.warning("Invalid HEATMAP_TIME_WINDOW=%r, falling back to 24h", window)
         window = "24h"
 
@@ -184,7 +344,10 @@ def _build_country_query() -> str:
         f'GROUP BY "country_code"'
     )
 
-def _parse_country_hits(payload: Dict[str, Any]) -> Dict[str, float]:
+_COUNTRY_QUERY_STRING = _build_country_query()
+_COUNTRY_QUERY_URL = _query_url(_COUNTRY_QUERY_STRING)
+
+def _parse_country_hits(payload: InfluxResponse) -> Dict[str, float]:
     """
     Influx groups by tags => each series has tags.country_code
     and values like [time, hits]
@@ -192,18 +355,17 @@ def _parse_country_hits(payload: Dict[str, Any]) -> Dict[str, float]:
     """
     out: Dict[str, float] = {}
 
-    results = payload.get("results") or []
-    if not results:
+    result = _first_result(payload)
+    if result is None:
         return out
 
-    series_list = results[0].get("series") or []
-    for s in series_list:
-        tags = s.get("tags") or {}
+    for s in result.series:
+        tags = s.tags or {}
         cc = tags.get("country_code")
         if not cc:
             continue
 
-        values = s.get("values") or []
+        values = s.values
         hits = 0.0
         if values and len(values[0]) >= 2 and values[0][1] is not None:
             try:
@@ -216,6 +378,100 @@ def _parse_country_hits(payload: Dict[str, Any]) -> Dict[str, float]:
 
     return out
 
+
+def _etag(body: bytes) -> str:
+    return 'W/"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # weak comparison: ignore W/ prefixes
+    want = etag.removeprefix("W/")
+    return any(t.strip().removeprefix("W/") == want for t in if_none_match.split(","))
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """Parse Accept-Encoding codings; an explicit gzip entry wins over *, q=0 means refused."""
+    qs: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, *params = (p.strip() for p in part.split(";"))
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qs[coding.lower()] = q
+    return qs.get("gzip", qs.get("*", 0.0)) > 0
+
+
+async def _refresh() -> None:
+    """Query Influx for heatmap points and swap in the encoded /data payload."""
+    global _cache_at, _cache_count, _cache_bytes, _cache_bytes_gz, _cache_etag, _cache_last_error
+
+    try:
+        payload = await _influx_query(_QUERY_URL)
+        pts = _parse_points(payload)
+        _cache_count = len(pts)
+        _cache_bytes = orjson.dumps(pts)
+        _cache_last_error = None
+
+        log.info("Refreshed /data points=%s", len(pts))
+        if DEBUG and len(pts) == 0:
+            log.warning("No points returned. Check Influx connection/auth/db/measurement/time_window.")
+
+    except Exception as e:
+        _cache_last_error = repr(e)
+        log.exception("/data refresh failed")
+        _cache_count = 0
+        _cache_bytes = b"[]"
+
+    # compress once per refresh rather than per response
+    _cache_bytes_gz = (
+        gzip.compress(_cache_bytes, mtime=0) if len(_cache_bytes) >= _GZIP_MIN_BYTES else None
+    )
+    _cache_etag = _etag(_cache_bytes)
+    _cache_at = time.time()
+
+
+async def _refresher() -> None:
+    # refresh immediately so the cache is warm shortly after startup
+    while True:
+        async with _refresh_lock:
+            await _refresh()
+        await asyncio.sleep(HEATMAP_CACHE_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    global CLIENT
+
+    CLIENT = httpx.AsyncClient(
+        base_url=INFLUX_BASE,
+        timeout=10.0,
+        auth=_AUTH,
+        limits=INFLUX_LIMITS,
+    )
+    refresher = asyncio.create_task(_refresher()) if HEATMAP_CACHE_SECONDS > 0 else None
+    try:
+        yield
+    finally:
+        if refresher is not None:
+            refresher.cancel()
+            with suppress(asyncio.CancelledError):
+                await refresher
+        await CLIENT.aclose()
+        CLIENT = None
+
+
+APP = FastAPI(title="homepage-geoip-heatmap", lifespan=lifespan)
+
+
 @APP.get("/healthz")
 def healthz() -> Dict[str, bool]:
     return {"ok": True}
@@ -233,103 +489,104 @@ def config() -> Dict[str, Any]:
 
 @APP.get("/", response_class=HTMLResponse)
 def index() -> HTMLResponse:
-    try:
-        with open("/app/index.html", "r", encoding="utf-8") as f:
-            return HTMLResponse(f.read())
-    except FileNotFoundError:
+    if _INDEX_HTML is None:
         return HTMLResponse("<h1>index.html not found</h1>", status_code=500)
+    return HTMLResponse(_INDEX_HTML)
 
 
 @APP.get("/data")
-def data() -> JSONResponse:
-    global _cache_at, _cache_points, _cache_last_error
-
-    now = time.time()
-    if HEATMAP_CACHE_SECONDS > 0 and (now - _cache_at) < HEATMAP_CACHE_SECONDS:
-        if DEBUG:
-            log.debug("GET /data cache-hit points=%s", len(_cache_points))
-        return JSONResponse(_cache_points)
+async def data(request: Request) -> Response:
+    # caching disabled (no background refresher), or the first refresh hasn't landed yet
+    if HEATMAP_CACHE_SECONDS <= 0 or _cache_at == 0.0:
+        requested_at = time.time()
+        async with _refresh_lock:
+            # a refresh that finished while we waited already covers this request
+            if _cache_at < requested_at:
+                await _refresh()
+
+    # In debug, return more detail (still safe-ish: doesn't leak password)
+    if DEBUG and _cache_last_error:
+        return JSONResponse(
+            {
+                "error": "influx_query_failed",
+                "exception": _cache_last_error,
+                "influx_base": INFLUX_BASE,
+                "db": INFLUX_DATABASE,
+                "measurement": GEO_MEASUREMENT,
+                "window": HEATMAP_TIME_WINDOW,
+            },
+            status_code=502,
+        )
+
+    headers = {
+        "ETag": _cache_etag,
+        "Cache-Control": f"max-age={max(HEATMAP_CACHE_SECONDS, 0)}",
+        "Vary": "Accept-Encoding",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), _cache_etag):
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("GET /data not-modified etag=%s", _cache_etag)
+        return Response(status_code=304, headers=headers)
 
-    q = _build_query()
-    try:
-        payload = _influx_query(q)
-        pts = _parse_points(payload)
-        _cache_points = pts
-        _cache_last_error = None
-        _cache_at = now
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("GET /data points=%s", _cache_count)
 
-        log.info("GET /data points=%s", len(pts))
-        if DEBUG and len(pts) == 0:
-            log.warning("No points returned. Check Influx connection/auth/db/measurement/time_window.")
-        return JSONResponse(_cache_points)
-
-    except Exception as e:
-        _cache_last_error = repr(e)
-        log.exception("GET /data failed")
-        _cache_points = []
-        _cache_at = now
-
-        # In debug, return more detail (still safe-ish: doesn't leak password)
-        if DEBUG:
-            return JSONResponse(
-                {
-                    "error": "influx_query_failed",
-                    "exception": repr(e),
-                    "influx_base": INFLUX_BASE,
-                    "db": INFLUX_DATABASE,
-                    "measurement": GEO_MEASUREMENT,
-                    "window": HEATMAP_TIME_WINDOW,
-                },
-                status_code=502,
-            )
-
-        return JSONResponse([])
+    body = _cache_bytes
+    if _cache_bytes_gz is not None and _accepts_gzip(request.headers.get("accept-encoding", "")):
+        body = _cache_bytes_gz
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, media_type="application/json", headers=headers)
 
 # choropleth
 @APP.get("/data/countries")
-def data_countries() -> JSONResponse:
+async def data_countries() -> JSONResponse:
     global _country_cache_at, _country_cache, _country_cache_last_error
 
     now = time.time()
     if HEATMAP_CACHE_SECONDS > 0 and (now - _country_cache_at) < HEATMAP_CACHE_SECONDS:
-        if DEBUG:
+        if log.isEnabledFor(logging.DEBUG):
             log.debug("GET /data/countries cache-hit countries=%s", len(_country_cache))
         return JSONResponse(_country_cache)
 
-    q = _build_country_query()
-    try:
-        payload = _influx_query(q)
-        hits = _parse_country_hits(payload)
-        _country_cache = hits
-        _country_cache_last_error = None
-        _country_cache_at = now
-
-        log.info("GET /data/countries countries=%s", len(hits))
-        if DEBUG and len(hits) == 0:
-            log.warning("No country hits returned. Check Influx tags/schema/time_window.")
-        return JSONResponse(_country_cache)
+    async with _country_refresh_lock:
+        # a refresh that finished while we waited already covers this request
+        if _country_cache_at >= now:
+            return JSONResponse(_country_cache)
 
-    except Exception as e:
-        _country_cache_last_error = repr(e)
-        log.exception("GET /data/countries failed")
-        _country_cache = {}
-        _country_cache_at = now
-
-        if DEBUG:
-            return JSONResponse(
-                {
-                    "error": "influx_query_failed",
-                    "exception": repr(e),
-                    "influx_base": INFLUX_BASE,
-                    "db": INFLUX_DATABASE,
-                    "measurement": GEO_MEASUREMENT,
-                    "window": HEATMAP_TIME_WINDOW,
-                    "query": q,
-                },
-                status_code=502,
-            )
-
-        return JSONResponse({})
+        q = _COUNTRY_QUERY_STRING
+        try:
+            payload = await _influx_query(_COUNTRY_QUERY_URL)
+            hits = _parse_country_hits(payload)
+            _country_cache = hits
+            _country_cache_last_error = None
+            _country_cache_at = time.time()
+
+            log.info("GET /data/countries countries=%s", len(hits))
+            if DEBUG and len(hits) == 0:
+                log.warning("No country hits returned. Check Influx tags/schema/time_window.")
+            return JSONResponse(_country_cache)
+
+        except Exception as e:
+            _country_cache_last_error = repr(e)
+            log.exception("GET /data/countries failed")
+            _country_cache = {}
+            _country_cache_at = time.time()
+
+            if DEBUG:
+                return JSONResponse(
+                    {
+                        "error": "influx_query_failed",
+                        "exception": repr(e),
+                        "influx_base": INFLUX_BASE,
+                        "db": INFLUX_DATABASE,
+                        "measurement": GEO_MEASUREMENT,
+                        "window": HEATMAP_TIME_WINDOW,
+                        "query": q,
+                    },
+                    status_code=502,
+                )
+
+            return JSONResponse({})
 
 @APP.get("/debug/query", response_class=PlainTextResponse)
 def debug_query() -> str: